@@ -1,15 +1,113 @@
 """
 Stock Analysis Tool for Excel 
-Requirements: pip install xlwings yfinance pandas matplotlib requests beautifulsoup4
+Requirements: pip install xlwings yfinance pandas matplotlib requests lxml
+Optional: pip install requests-cache (caches news RSS responses on disk for 15 min)
+          pip install numba (JIT-compiles the per-bar price statistics)
+          pip install tsdownsample (LTTB downsampling for the comparison chart)
 """
 
 import xlwings as xw
 import yfinance as yf
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # charts are only embedded in Excel, never shown
+matplotlib.rcParams.update({
+    'path.simplify': True,            # merge nearly collinear line segments before rasterizing
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,      # draw long paths in chunks
+    'figure.max_open_warning': 0,
+})
+import matplotlib.dates as mdates
+from matplotlib.artist import setp
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.ticker import FuncFormatter
+from datetime import datetime, timedelta, date
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+import html
+import os
+import re
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the decorated functions just run as NumPy
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+try:
+    from tsdownsample import LTTBDownsampler
+except ImportError:  # optional; downsample_indices falls back to NumPy min/max buckets
+    LTTBDownsampler = None
+
+# HTTP session for the news RSS feed; with requests-cache installed, repeat runs hit
+# local SQLite next to this file. Not handed to yfinance: current releases only accept
+# their own curl_cffi sessions and reject anything else.
+try:
+    import requests_cache
+    http_session = requests_cache.CachedSession(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yf_cache'),
+        expire_after=900, backend='sqlite')
+except Exception:  # not installed, or the cache file can't be created
+    http_session = None
+
+# Map dropdown text -> yfinance period codes
+_PERIOD_MAP = {
+    '1 Week': '5d',
+    '1 Month': '1mo',
+    '3 Months': '3mo',
+    '6 Months': '6mo',
+    '1 Year': '1y',
+    '2 Years': '2y',
+    '5 Years': '5y',
+    'Max': 'max'
+}
+
+# Metric table layout shared by both sheets (names must match keys in `metrics`)
+_SECTIONS = (
+    ("INCOME STATEMENT", (
+        "Revenue (TTM)",
+        "Net Income (TTM)",
+        "Operating Income (TTM)",
+        "EBITDA (TTM)",
+    )),
+    ("PROFITABILITY & MARGINS", (
+        "Profit Margin",
+        "Operating Margin",
+        "EBITDA Margin",
+        "Return on Equity (ROE)",
+    )),
+    ("GROWTH", (
+        "Revenue Growth (YoY)",
+        "Earnings Growth (YoY)",
+        "Price Change (Period)",
+    )),
+    ("VALUATION", (
+        "Current Price",
+        "Market Cap",
+        "52-Week High",
+        "52-Week Low",
+        "Distance from 52W High",
+        "P/E Ratio",
+        "Forward P/E",
+        "Price to Sales (P/S)",
+    )),
+    ("DIVIDENDS", (
+        "Dividend Yield",
+        "Payout Ratio",
+    )),
+    ("RISK", (
+        "Beta",
+        "Volatility (Annualized)",
+    )),
+)
 
 def get_stock_data(ticker, period):
     """Fetch stock data from Yahoo Finance"""
@@ -20,7 +118,103 @@ def get_stock_data(ticker, period):
         return stock, hist, info
     except Exception as e:
         return None, None, None
-    
+
+
+def _fetch_fundamentals(stock, hist, period):
+    """Pull info + statements for one ticker (runs in a worker thread).
+    Statements land in the _fetch_statement cache, so later reads are free.
+    If the batch download had no rows for this ticker, its history is fetched here too."""
+    if hist is None or hist.empty:
+        hist = stock.history(period=period)
+        if getattr(hist.index, 'tz', None) is not None:
+            hist.index = hist.index.tz_localize(None)  # match yf.download's naive index
+    info = stock.info
+    as_of_date = date.today().isoformat()
+    for kind in ("financials", "cashflow"):
+        try:
+            _fetch_statement(stock, kind, as_of_date)
+        except Exception:
+            pass  # get_statement_metrics retries and falls back to N/A
+    return hist, info
+
+
+def get_stock_data_bulk(tickers, period):
+    """
+    Fetch stock data for several tickers at once.
+    History comes from a single threaded yf.download call; info/statements
+    (and history for any ticker the batch missed) are fetched concurrently.
+    Returns {ticker: (stock, hist, info)}.
+    """
+    data = {t: (None, None, None) for t in tickers}
+    try:
+        stocks = yf.Tickers(" ".join(tickers)).tickers
+    except Exception as e:
+        print(f"Could not create tickers: {e}")
+        return data
+
+    try:
+        # auto_adjust pinned so closes match stock.history() (its default) on every yfinance version
+        hist_panel = yf.download(tickers, period=period, group_by='ticker', auto_adjust=True,
+                                 threads=True, progress=False)
+    except Exception as e:
+        print(f"Bulk download failed, fetching per ticker: {e}")
+        hist_panel = None
+
+    def panel_slice(t):
+        try:
+            return hist_panel[t].dropna(how='all')
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        futures = {t: ex.submit(_fetch_fundamentals, stocks[t], panel_slice(t), period) for t in tickers}
+
+    for t in tickers:
+        try:
+            hist, info = futures[t].result()
+            data[t] = (stocks[t], hist, info)
+        except Exception as e:
+            print(f"Bulk fetch failed for {t}: {e}")
+
+    return data
+
+
+class _TickerKey:
+    """Wraps a yf.Ticker for lru_cache: hashes/compares by symbol, so the cache
+    key stays (ticker, kind, day) while the fetch goes through the caller's Ticker"""
+    __slots__ = ('stock',)
+
+    def __init__(self, stock):
+        self.stock = stock
+
+    def __hash__(self):
+        return hash(self.stock.ticker)
+
+    def __eq__(self, other):
+        return isinstance(other, _TickerKey) and self.stock.ticker == other.stock.ticker
+
+
+@lru_cache(maxsize=128)
+def _cached_statement(key, kind, as_of_date):
+    table = getattr(key.stock, kind)
+    if table is None or table.empty:
+        raise ValueError(f"No {kind} data for {key.stock.ticker}")
+    return tuple(table.iloc[:, 0].items())
+
+
+def _fetch_statement(stock, kind, as_of_date):
+    """
+    Fetch one statement table ("financials" or "cashflow") through `stock` and
+    keep only its latest column, as immutable (label, value) pairs.
+    Cached per (ticker, kind, day); failures raise and are not cached.
+    yfinance reports most fetch failures as an empty table, so that raises too.
+    """
+    return _cached_statement(_TickerKey(stock), kind, as_of_date)
+
+
+def clear_statement_cache():
+    """Drop cached statements (e.g. from a Refresh button) so the next run re-fetches"""
+    _cached_statement.cache_clear()
 
     
 def get_statement_metrics(stock):
@@ -40,29 +234,20 @@ def get_statement_metrics(stock):
 
     # Income Statement
     try:
-        fin = stock.financials
-        if fin is not None and not fin.empty:
-            col = fin.columns[0]
-            if "Total Revenue" in fin.index:
-                out["Revenue (TTM)"] = fin.loc["Total Revenue", col]
-            if "Net Income" in fin.index:
-                out["Net Income (TTM)"] = fin.loc["Net Income", col]
-            if "Operating Income" in fin.index:
-                out["Operating Income (TTM)"] = fin.loc["Operating Income", col]
-            if "EBITDA" in fin.index:
-                out["EBITDA (TTM)"] = fin.loc["EBITDA", col]
+        fin_col = dict(_fetch_statement(stock, "financials", date.today().isoformat()))
+        out["Revenue (TTM)"] = fin_col.get("Total Revenue")
+        out["Net Income (TTM)"] = fin_col.get("Net Income")
+        out["Operating Income (TTM)"] = fin_col.get("Operating Income")
+        out["EBITDA (TTM)"] = fin_col.get("EBITDA")
     except:
         pass
 
     # Cash Flow
     try:
-        cf = stock.cashflow
-        if cf is not None and not cf.empty:
-            col = cf.columns[0]
-            if "Total Cash From Operating Activities" in cf.index:
-                out["Cash From Ops (TTM)"] = cf.loc["Total Cash From Operating Activities", col]
-            if "Capital Expenditures" in cf.index:
-                out["CapEx (TTM)"] = cf.loc["Capital Expenditures", col]
+        cf_col = dict(_fetch_statement(stock, "cashflow", date.today().isoformat()))
+        if cf_col:
+            out["Cash From Ops (TTM)"] = cf_col.get("Total Cash From Operating Activities")
+            out["CapEx (TTM)"] = cf_col.get("Capital Expenditures")
 
             cfo = out["Cash From Ops (TTM)"]
             capex = out["CapEx (TTM)"]
@@ -94,36 +279,208 @@ def fmt_money(x):
     
 
 
-def format_metrics_table(sheet, start_row, end_row):
-    """Apply professional formatting to metrics table"""
-    # Header styling - dark blue background, white text
-    header_cells = [start_row + i for i in [0, 5, 9, 11, 16, 18, 19]]  # Section headers
-    for row in header_cells:
-        cell_range = sheet.range(f'A{row}:B{row}')
-        cell_range.color = (31, 78, 120)  # Dark blue
-        cell_range.api.Font.Color = 0xFFFFFF  # White text
-        cell_range.api.Font.Bold = True
-        cell_range.api.Font.Size = 12
-    
-    # Metric rows - alternating colors
-    metric_row = start_row + 1
-    while metric_row <= end_row:
-        if sheet.range(f'A{metric_row}').value and sheet.range(f'A{metric_row}').api.Font.Bold == False:
-            if (metric_row - start_row) % 2 == 0:
-                sheet.range(f'A{metric_row}:B{metric_row}').color = (242, 242, 242)  # Light gray
-            else:
-                sheet.range(f'A{metric_row}:B{metric_row}').color = (255, 255, 255)  # White
-        metric_row += 1
-    
-    # Add borders
-    for row in range(start_row, end_row + 1):
-        cell_range = sheet.range(f'A{row}:B{row}')
-        # Add thin borders
-        for border_id in [7, 8, 9, 10]:  # xlEdgeLeft, xlEdgeTop, xlEdgeBottom, xlEdgeRight
-            cell_range.api.Borders(border_id).LineStyle = 1
-            cell_range.api.Borders(border_id).Weight = 2
-
-def calculate_key_metrics(info, hist, statement_metrics):
+# Font styles for apply_style; color_rgb is Excel's BGR int, None leaves a property untouched
+STYLE_TITLE = dict(size=18, bold=True, color_rgb=None)
+STYLE_BANNER = dict(size=16, bold=True, color_rgb=0xFFFFFF)   # KEY METRICS / STOCK COMPARISON bars
+STYLE_HEADER = dict(size=11, bold=True, color_rgb=0xFFFFFF)   # section + column headers
+
+
+def apply_style(rng, style):
+    """Apply a font style dict to a (possibly multi-area) range through one Font object"""
+    font = rng.api.Font
+    if style.get('size') is not None:
+        font.Size = style['size']
+    if style.get('bold') is not None:
+        font.Bold = style['bold']
+    if style.get('color_rgb') is not None:
+        font.Color = style['color_rgb']
+
+
+@contextmanager
+def excel_paused(app):
+    """Turn off repaint, recalculation and events for a batch of writes, then restore them"""
+    prev = (app.screen_updating, app.calculation, app.enable_events)
+    app.screen_updating = False
+    app.calculation = 'manual'
+    app.enable_events = False
+    try:
+        yield
+    finally:
+        app.screen_updating, app.calculation, app.enable_events = prev
+
+
+def plot_dates(index):
+    """DatetimeIndex -> datetime64 array (tz dropped) so matplotlib skips per-Timestamp conversion"""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy()
+
+
+def moving_averages(close, windows=(50, 200)):
+    """
+    Simple moving averages for every window the series is long enough for,
+    all derived from one cumulative sum. Returns {window: array aligned to
+    `close`}, NaN before the first full window and in any window holding a
+    missing close (same as rolling(w).mean()).
+    """
+    close = np.asarray(close, dtype=float)
+    finite = np.isfinite(close)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(finite, close, 0.0))))
+    ccount = np.concatenate(([0], np.cumsum(finite)))  # running count of valid closes
+    mas = {}
+    for w in windows:
+        if len(close) >= w:
+            ma = np.full(len(close), np.nan)
+            full = (ccount[w:] - ccount[:-w]) == w
+            ma[w - 1:] = np.where(full, (csum[w:] - csum[:-w]) / w, np.nan)
+            mas[w] = ma
+    return mas
+
+
+def _downsample_step(n, target=500):
+    """Row stride _downsample uses for `n` rows: the smallest k keeping at most ~`target` points"""
+    return max(1, -(-n // target))  # ceiling division
+
+
+def _downsample(data, target=500):
+    """
+    Every k-th row of `data` (DataFrame or array) so about `target` points
+    get plotted; the last row is always kept so the line ends on today's price.
+    """
+    step = _downsample_step(len(data), target)
+    if step == 1:
+        return data
+    positions = np.arange(len(data) - 1, -1, -step)[::-1]
+    return data.iloc[positions] if hasattr(data, 'iloc') else data[positions]
+
+
+def get_last_row(book, name, default):
+    """Read the last written row stashed in a workbook defined name by set_last_row"""
+    try:
+        return int(str(book.names[name].refers_to).lstrip('='))
+    except Exception:
+        return default
+
+
+def set_last_row(book, name, row):
+    """Remember the last written row (as a constant defined name) so the next run clears only that far"""
+    try:
+        book.names.add(name, f"={row}")
+    except Exception as e:
+        print(f"Could not record {name}: {e}")
+
+
+def _minmax_indices(y, n_bins=250):
+    """Positions of the min and max of each of `n_bins` equal buckets (plus both ends)"""
+    y = np.asarray(y, dtype=float)
+    lows = np.where(np.isfinite(y), y, np.inf)
+    highs = np.where(np.isfinite(y), y, -np.inf)
+    edges = np.linspace(0, len(y), n_bins + 1).astype(int)
+    idx = [0, len(y) - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            idx.append(lo + int(np.argmin(lows[lo:hi])))
+            idx.append(lo + int(np.argmax(highs[lo:hi])))
+    return np.unique(idx)
+
+
+def downsample_indices(x, y, n_out=1200):
+    """
+    Positions of the points worth plotting from a long (x, y) series so its
+    shape survives at chart resolution. Uses LTTB from tsdownsample when
+    installed, otherwise NumPy min/max buckets. Short series are returned whole.
+    """
+    if len(y) <= n_out:
+        return np.arange(len(y))
+    if LTTBDownsampler is not None:
+        return LTTBDownsampler().downsample(np.asarray(x), np.asarray(y, dtype=np.float64), n_out=n_out)
+    return _minmax_indices(y)
+
+
+# Fixed PNG export settings for embedded charts (Agg cost grows with dpi squared)
+CHART_EXPORT_OPTIONS = {'dpi': 100, 'bbox_inches': 'tight'}
+
+_compare_fig = None
+
+
+def figsize_for_points(width, height, dpi=CHART_EXPORT_OPTIONS['dpi']):
+    """Figure size (inches) whose PNG at `dpi` matches a width x height (points) area on screen"""
+    px_per_point = 96 / 72  # xlwings reports points; Excel draws at 96 px/inch
+    return width * px_per_point / dpi, height * px_per_point / dpi
+
+
+def _get_compare_fig(figsize=(12, 7)):
+    """
+    The comparison Figure (line chart left, summary table right), built once
+    and reused across compare_stocks runs with its axes cleared and resized
+    to `figsize`.
+    """
+    global _compare_fig
+    if _compare_fig is None:
+        fig = Figure(figsize=figsize)
+        gs = fig.add_gridspec(1, 2, width_ratios=[3.2, 1.4])
+        ax = fig.add_subplot(gs[0, 0])       # chart axis (left)
+        ax_tbl = fig.add_subplot(gs[0, 1])   # table axis (right)
+        _compare_fig = (fig, ax, ax_tbl)
+
+    fig, ax, ax_tbl = _compare_fig
+    fig.set_size_inches(figsize)
+    ax.clear()
+    ax_tbl.clear()
+    ax_tbl.axis('off')
+    return fig, ax, ax_tbl
+
+
+def column_letter(col):
+    """1-based column number -> Excel column letters (1 -> A, 27 -> AA)"""
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def range_unions(sheet, addresses):
+    """
+    Yield multi-area ranges covering `addresses` (e.g. "A8:B8,A10:B10,...")
+    so one COM call formats many rows. Excel caps an address string at 255
+    chars, so long lists are split into several unions.
+    """
+    group = []
+    length = 0
+    for address in addresses:
+        if group and length + len(address) + 1 > 255:
+            yield sheet.range(",".join(group))
+            group, length = [], 0
+        group.append(address)
+        length += len(address) + 1
+    if group:
+        yield sheet.range(",".join(group))
+
+
+@njit(cache=True)
+def summary_stats(close):
+    """Total return and daily-return volatility (both as fractions) of a close-price array"""
+    ret = (close[-1] - close[0]) / close[0]
+    vol = np.std(np.diff(close) / close[:-1])
+    return ret, vol
+
+
+def _field(info, fast, key, fast_key=None):
+    """
+    info[key], falling back to fast_info[fast_key] only when Yahoo's info
+    bundle lacks it (fast_info fields can trigger their own requests).
+    """
+    value = info.get(key)
+    if value is None and fast is not None and fast_key:
+        try:
+            value = fast[fast_key]
+        except Exception:
+            value = None
+    return value
+
+
+def calculate_key_metrics(info, hist, statement_metrics, fast_info=None):
     """
     Return metrics in clean grouped order:
     Income Statement -> Profitability -> Growth -> Valuation -> Dividends -> Risk
@@ -192,17 +549,17 @@ def calculate_key_metrics(info, hist, statement_metrics):
         # =========================
         # VALUATION
         # =========================
-        metrics["Current Price"] = info.get("currentPrice", "N/A")
-        metrics["Market Cap"] = fmt_money(info.get("marketCap", None))
+        current_price = _field(info, fast_info, "currentPrice", "last_price")
+        metrics["Current Price"] = current_price if current_price is not None else "N/A"
+        metrics["Market Cap"] = fmt_money(_field(info, fast_info, "marketCap", "market_cap"))
         # 52-Week Range
-        fifty_two_week_high = info.get("fiftyTwoWeekHigh", None)
-        fifty_two_week_low = info.get("fiftyTwoWeekLow", None)
+        fifty_two_week_high = _field(info, fast_info, "fiftyTwoWeekHigh", "year_high")
+        fifty_two_week_low = _field(info, fast_info, "fiftyTwoWeekLow", "year_low")
         
         metrics["52-Week High"] = f"${fifty_two_week_high:.2f}" if fifty_two_week_high else "N/A"
         metrics["52-Week Low"] = f"${fifty_two_week_low:.2f}" if fifty_two_week_low else "N/A"
         
         # Calculate distance from 52-week high
-        current_price = info.get("currentPrice", None)
         if current_price and fifty_two_week_high:
             distance_from_high = ((current_price - fifty_two_week_high) / fifty_two_week_high) * 100
             metrics["Distance from 52W High"] = f"{distance_from_high:.2f}%"
@@ -236,18 +593,56 @@ def calculate_key_metrics(info, hist, statement_metrics):
         # =========================
         metrics["Beta"] = round(info.get("beta", 0), 2) if info.get("beta") else "N/A"
 
+        # Price return / volatility over the selected period
+        metrics["Price Change (Period)"] = "N/A"
+        metrics["Volatility (Annualized)"] = "N/A"
+        if hist is not None and len(hist) >= 2:
+            period_return, daily_vol = summary_stats(hist['Close'].to_numpy(dtype=np.float64))
+            if np.isfinite(period_return):
+                metrics["Price Change (Period)"] = f"{period_return * 100:.2f}%"
+            if np.isfinite(daily_vol):
+                metrics["Volatility (Annualized)"] = f"{daily_vol * np.sqrt(252) * 100:.2f}%"
+
     except Exception as e:
         print(f"Error calculating metrics: {e}")
 
     return metrics
 
-def get_stock_news(ticker):
-    """Fetch recent news for the stock"""
+_RSS_ITEM = re.compile(rb'<item>(.*?)</item>', re.S)
+_RSS_FIELDS = tuple(
+    re.compile(rb'<' + tag + rb'>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</' + tag + rb'>', re.S)
+    for tag in (b'title', b'link', b'pubDate')
+)
+
+
+def parse_rss_items(content, limit=10):
+    """
+    (title, link, pub_date) for the first `limit` RSS items, pulled straight
+    from the bytes with regex. Falls back to lxml when the regex finds no
+    items (unexpected markup); missing fields come back as None.
+    """
+    items = []
+    for chunk in _RSS_ITEM.findall(content)[:limit]:
+        fields = []
+        for pattern in _RSS_FIELDS:
+            match = pattern.search(chunk)
+            fields.append(html.unescape(match.group(1).decode('utf-8', 'replace')).strip() if match else None)
+        items.append(tuple(fields))
+
+    if not items:
+        root = etree.fromstring(content)
+        items = [(it.findtext('title'), it.findtext('link'), it.findtext('pubDate'))
+                 for it in root.findall('.//item')[:limit]]
+    return items
+
+
+def get_stock_news(ticker, stock=None):
+    """Fetch recent news for the stock (reuses `stock` when the caller already has a Ticker)"""
     news_data = []
     
     # Method 1: Try yfinance news
     try:
-        stock = yf.Ticker(ticker)
+        stock = stock or yf.Ticker(ticker)
         news = stock.news
         
         if news and len(news) > 0:
@@ -281,16 +676,13 @@ def get_stock_news(ticker):
     # Method 2: Google News RSS fallback
     try:
         rss_url = f"https://news.google.com/rss/search?q={ticker}+stock&hl=en-US&gl=US&ceid=US:en"
-        response = requests.get(rss_url, timeout=10)
+        response = (http_session or requests).get(rss_url, timeout=10)
         
         if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'xml')
-            items = soup.find_all('item')[:10]
-            
-            for item in items:
-                title = item.find('title').text if item.find('title') else 'N/A'
-                link = item.find('link').text if item.find('link') else 'N/A'
-                pub_date = item.find('pubDate').text if item.find('pubDate') else 'Recent'
+            for title, link, pub_date in parse_rss_items(response.content, limit=10):
+                title = title or 'N/A'
+                link = link or 'N/A'
+                pub_date = pub_date or 'Recent'
                 
                 if ' - ' in title:
                     parts = title.rsplit(' - ', 1)
@@ -323,47 +715,42 @@ def get_stock_news(ticker):
     
     return news_data
 
-def update_news_sheet(ticker, wb):
-    """Update news sheet with latest news"""
-    news_sheet = wb.sheets['News']
-    news_sheet.clear_contents()
-
-    news_data = get_stock_news(ticker)
-
-    news_sheet.range('A1').value = f"Recent News for {ticker}"
-    news_sheet.range('A1').font.size = 16
-    news_sheet.range('A1').font.bold = True
-
-    news_sheet.range('A3').value = [['Title', 'Publisher', 'Published', 'Link']]
-    news_sheet.range('A3:D3').font.bold = True
-
-    row = 4
-    for news in (news_data or []):
-        news_sheet.range(f'A{row}').value = news.get('Title', '')
-        news_sheet.range(f'B{row}').value = news.get('Publisher', '')
-        news_sheet.range(f'C{row}').value = news.get('Published', '')
-
-        link = news.get('Link', '')
-        cell = news_sheet.range(f'D{row}')
-        cell.value = ""
-
-        if isinstance(link, str) and link.startswith("http"):
-            try:
-                # Reliable hyperlink add (avoids #VALUE! formula issues)
-                cell.api.Hyperlinks.Add(Anchor=cell.api, Address=link, TextToDisplay="View Article")
-            except:
-                # fallback: show raw URL
-                cell.value = link
-        else:
-            cell.value = ""
-
-        row += 1
+def update_news_sheet(ticker, wb, stock=None, news_data=None):
+    """Update news sheet with latest news (pass `news_data` to skip the fetch)"""
+    if news_data is None:
+        news_data = get_stock_news(ticker, stock=stock)
+
+    with excel_paused(wb.app):
+        news_sheet = wb.sheets['News']
+        news_sheet.clear_contents()
+
+        title_cell = news_sheet.range('A1')
+        title_cell.value = f"Recent News for {ticker}"
+        title_cell.font.size = 16
+        title_cell.font.bold = True
+
+        # Header + all Title/Publisher/Published rows in one write; links are added below
+        news_data = news_data or []
+        matrix = [[n.get('Title', ''), n.get('Publisher', ''), n.get('Published', ''), ''] for n in news_data]
+        news_sheet.range('A3').value = [['Title', 'Publisher', 'Published', 'Link']] + matrix
+        news_sheet.range('A3:D3').font.bold = True
+
+        for i, news in enumerate(news_data):
+            link = news.get('Link', '')
+            if isinstance(link, str) and link.startswith("http"):
+                cell = news_sheet.range(4 + i, 4)
+                try:
+                    # Reliable hyperlink add (avoids #VALUE! formula issues)
+                    cell.api.Hyperlinks.Add(Anchor=cell.api, Address=link, TextToDisplay="View Article")
+                except:
+                    # fallback: show raw URL
+                    cell.value = link
 
-    # Format columns
-    news_sheet.range('A:A').column_width = 60
-    news_sheet.range('B:B').column_width = 20
-    news_sheet.range('C:C').column_width = 18
-    news_sheet.range('D:D').column_width = 14
+        # Format columns
+        news_sheet.range('A:A').column_width = 60
+        news_sheet.range('B:B').column_width = 20
+        news_sheet.range('C:C').column_width = 18
+        news_sheet.range('D:D').column_width = 14
 
 
 
@@ -381,18 +768,7 @@ def analyze_stock():
 
     ticker = str(ticker).upper().strip()
 
-    # Map dropdown text -> yfinance period codes
-    period_map = {
-        '1 Week': '5d',
-        '1 Month': '1mo',
-        '3 Months': '3mo',
-        '6 Months': '6mo',
-        '1 Year': '1y',
-        '2 Years': '2y',
-        '5 Years': '5y',
-        'Max': 'max'
-    }
-    period = period_map.get(str(period_option).strip(), '1y')
+    period = _PERIOD_MAP.get(str(period_option).strip(), '1y')
 
     # Status
     single_sheet.range('B5').value = f"Loading data for {ticker}..."
@@ -403,241 +779,224 @@ def analyze_stock():
         single_sheet.range('B5').value = f"Error: Could not fetch data for {ticker}"
         return
 
-    # THIS IS WHERE THE INDENTATION WAS WRONG - this try block needs to be at this level
+    # --- Metrics + news (network) before Excel is paused ---
+    statement_metrics = get_statement_metrics(stock)
+    fast_info = stock.fast_info
+    metrics = calculate_key_metrics(info, hist, statement_metrics, fast_info)
+    # Same info -> fast_info fallback as the table, so the chart's 52W lines match it
+    fifty_two_week_high = _field(info, fast_info, "fiftyTwoWeekHigh", "year_high")
+    fifty_two_week_low = _field(info, fast_info, "fiftyTwoWeekLow", "year_low")
     try:
-        # Remove old chart if it exists
+        news_data = get_stock_news(ticker, stock=stock)
+    except Exception as e:
+        print(f"Error fetching news: {e}")
+        news_data = None
+
+    with excel_paused(wb.app):
+        # THIS IS WHERE THE INDENTATION WAS WRONG - this try block needs to be at this level
         try:
-            single_sheet.pictures['StockChart'].delete()
-        except Exception:
-            pass
+            # Remove old chart if it exists
+            try:
+                single_sheet.pictures['StockChart'].delete()
+            except Exception:
+                pass
 
-        # Clear only the table/text area (safe)
-        single_sheet.range('A7:C200').clear_contents()
+            # Clear only the table/text area (safe)
+            last_row = max(get_last_row(wb, 'LastAnalysisRow', 200), 7)
+            single_sheet.range(f'A7:C{last_row}').clear_contents()
 
-    except Exception as e:
-        print(f"Warning: could not fully clear prior output: {e}")
+        except Exception as e:
+            print(f"Warning: could not fully clear prior output: {e}")
 
-    # --- Metrics ---
-    statement_metrics = get_statement_metrics(stock)
-    metrics = calculate_key_metrics(info, hist, statement_metrics)
-
-    # === SECTION 1: Company Header ===
-    row = 7
-    # ... rest of your code
-
-
-    single_sheet.range(f'A{row}').value = f"STOCK ANALYSIS: {ticker}"
-    single_sheet.range(f'A{row}').font.size = 18
-    single_sheet.range(f'A{row}').font.bold = True
-    row += 1
-
-    single_sheet.range(f'A{row}').value = f"Company: {info.get('longName', ticker)}"
-    single_sheet.range(f'A{row}').font.size = 12
-    row += 1
-
-    single_sheet.range(f'A{row}').value = (
-        f"Sector: {info.get('sector', 'N/A')} | Industry: {info.get('industry', 'N/A')}"
-    )
-    row += 1
-
-    single_sheet.range(f'A{row}').value = f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    row += 2
-
-    # === SECTION 2: Key Metrics Table ===
-    single_sheet.range(f'A{row}').value = "KEY METRICS"
-    single_sheet.range(f'A{row}').font.bold = True
-    single_sheet.range(f'A{row}').font.size = 16
-    single_sheet.range(f'A{row}:B{row}').color = (68, 114, 196)  # Blue header
-    single_sheet.range(f'A{row}').api.Font.Color = 0xFFFFFF  # White text
-    row += 2
-
-    start_metrics_row = row
-
-    start_metrics_row = row
-
-    # Define sections (names must match keys in `metrics`)
-    sections = {
-        "INCOME STATEMENT": [
-            "Revenue (TTM)",
-            "Net Income (TTM)",
-            "Operating Income (TTM)",
-            "EBITDA (TTM)",
-        ],
-        "PROFITABILITY & MARGINS": [
-            "Profit Margin",
-            "Operating Margin",
-            "EBITDA Margin",
-            "Return on Equity (ROE)",
-        ],
-        "GROWTH": [
-            "Revenue Growth (YoY)",
-            "Earnings Growth (YoY)",
-        ],
-        "VALUATION": [
-            "Current Price",
-            "Market Cap",
-            "52-Week High",
-            "52-Week Low",
-            "Distance from 52W High",
-            "P/E Ratio",
-            "Forward P/E",
-            "Price to Sales (P/S)",
-        ],
-        "DIVIDENDS": [
-            "Dividend Yield",
-            "Payout Ratio",
-        ],
-        "RISK": [
-            "Beta",
-        ],
-    }
+        # === SECTION 1: Company Header ===
+        row = 7
+        # ... rest of your code
 
-    for section_name, keys in sections.items():
-        # Section Header
-        single_sheet.range(f"A{row}").value = section_name
-        single_sheet.range(f"A{row}:B{row}").color = (31, 78, 120)  # Dark blue
-        single_sheet.range(f"A{row}").api.Font.Color = 0xFFFFFF  # White
-        single_sheet.range(f"A{row}").font.bold = True
-        single_sheet.range(f"A{row}").font.size = 11
+
+        cell = single_sheet.range(f'A{row}')
+        cell.value = f"STOCK ANALYSIS: {ticker}"
+        apply_style(cell, STYLE_TITLE)
         row += 1
 
-        # Rows under section with alternating colors
-        for i, key in enumerate(keys):
-            single_sheet.range(f"A{row}").value = key
-            single_sheet.range(f"B{row}").value = metrics.get(key, "N/A")
-            
-            # Alternating row colors
-            if i % 2 == 0:
-                single_sheet.range(f'A{row}:B{row}').color = (242, 242, 242)  # Light gray
-            else:
-                single_sheet.range(f'A{row}:B{row}').color = (255, 255, 255)  # White
-            
-            # Right align numbers
-            single_sheet.range(f"B{row}").api.HorizontalAlignment = -4152  # xlRight
-            
-            row += 1
+        cell = single_sheet.range(f'A{row}')
+        cell.value = f"Company: {info.get('longName', ticker)}"
+        cell.font.size = 12
+        row += 1
 
-        row += 1  # blank line after each section
+        single_sheet.range(f'A{row}').value = (
+            f"Sector: {info.get('sector', 'N/A')} | Industry: {info.get('industry', 'N/A')}"
+        )
+        row += 1
 
-    # Add borders to entire table
-    table_range = single_sheet.range(f'A{start_metrics_row}:B{row-1}')
-    for border_id in [7, 8, 9, 10, 11, 12]:  # All border types
-        table_range.api.Borders(border_id).LineStyle = 1
-        table_range.api.Borders(border_id).Weight = 2
-        table_range.api.Borders(border_id).Color = 0x000000
+        single_sheet.range(f'A{row}').value = f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        row += 2
 
-    # Format columns
-    single_sheet.range('A:A').column_width = 24
-    single_sheet.range('B:B').column_width = 20
-    # === SECTION 3: Enhanced Stock Price Chart with Volume ===
-    try:
-        # Create figure with 2 subplots (price and volume)
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8), 
-                                        gridspec_kw={'height_ratios': [3, 1]}, 
-                                        sharex=True)
-        
-        # ========== TOP CHART: PRICE + MOVING AVERAGES ==========
-        # Plot closing price
-        ax1.plot(hist.index, hist['Close'], linewidth=2.5, color='#2E86DE', label=f'{ticker}', zorder=3)
-        
-        # Calculate and plot moving averages
-        if len(hist) >= 50:
-            ma50 = hist['Close'].rolling(window=50).mean()
-            ax1.plot(hist.index, ma50, linewidth=1.5, color='#F39C12', 
-                    label='50-day MA', linestyle='--', alpha=0.8, zorder=2)
-        
-        if len(hist) >= 200:
-            ma200 = hist['Close'].rolling(window=200).mean()
-            ax1.plot(hist.index, ma200, linewidth=1.5, color='#E74C3C', 
-                    label='200-day MA', linestyle='--', alpha=0.8, zorder=2)
-        
-        # Add 52-week high/low lines
-        fifty_two_week_high = info.get("fiftyTwoWeekHigh", None)
-        fifty_two_week_low = info.get("fiftyTwoWeekLow", None)
-        
-        if fifty_two_week_high:
-            ax1.axhline(y=fifty_two_week_high, color='#27AE60', linestyle=':', 
-                       linewidth=1.5, alpha=0.6, label='52W High', zorder=1)
-        
-        if fifty_two_week_low:
-            ax1.axhline(y=fifty_two_week_low, color='#C0392B', linestyle=':', 
-                       linewidth=1.5, alpha=0.6, label='52W Low', zorder=1)
-        
-        # Add current price annotation
-        current_price = hist['Close'].iloc[-1]
-        last_date = hist.index[-1]
-        ax1.annotate(f'${current_price:.2f}', 
-                    xy=(last_date, current_price),
-                    xytext=(10, 0), 
-                    textcoords='offset points',
-                    fontsize=10,
-                    fontweight='bold',
-                    color='#2E86DE',
-                    bbox=dict(boxstyle='round,pad=0.4', facecolor='white', 
-                             edgecolor='#2E86DE', linewidth=2),
-                    zorder=5)
-        
-        # Add dot at current price
-        ax1.scatter([last_date], [current_price], color='#2E86DE', s=100, zorder=5)
-        
-        # Calculate price change
-        start_price = hist['Close'].iloc[0]
-        price_change = current_price - start_price
-        price_change_pct = (price_change / start_price) * 100
-        change_color = '#27AE60' if price_change >= 0 else '#E74C3C'
-        change_sign = '+' if price_change >= 0 else ''
-        
-        # Title with price change
-        title_text = f'{ticker} Stock Price - {period_option}\n{change_sign}${price_change:.2f} ({change_sign}{price_change_pct:.2f}%)'
-        ax1.set_title(title_text, fontsize=15, fontweight='bold', pad=15, color=change_color)
-        
-        ax1.set_ylabel('Price ($)', fontsize=11, fontweight='bold')
-        ax1.grid(True, alpha=0.2, linestyle='--')
-        ax1.set_facecolor('#F8F9FA')
-        ax1.legend(loc='upper left', fontsize=9, framealpha=0.9)
-        
-        # ========== BOTTOM CHART: VOLUME ==========
-        colors = ['#27AE60' if hist['Close'].iloc[i] >= hist['Open'].iloc[i] 
-                  else '#E74C3C' for i in range(len(hist))]
-        
-        ax2.bar(hist.index, hist['Volume'], color=colors, alpha=0.6, width=0.8)
-        ax2.set_ylabel('Volume', fontsize=11, fontweight='bold')
-        ax2.set_xlabel('Date', fontsize=11, fontweight='bold')
-        ax2.grid(True, alpha=0.2, linestyle='--', axis='y')
-        ax2.set_facecolor('#F8F9FA')
-        
-        # Format volume numbers (millions/billions)
-        ax2.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/1e6:.0f}M' if x >= 1e6 else f'{x:.0f}'))
-        
-        # Format x-axis dates as MM/YY
-        import matplotlib.dates as mdates
-        ax2.xaxis.set_major_formatter(mdates.DateFormatter('%m/%y'))
-        ax2.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
-        
-        plt.xticks(rotation=45, ha='right')
-        
-        fig.patch.set_facecolor('white')
-        plt.tight_layout()
-        
-        # Add chart to Excel
-        single_sheet.pictures.add(fig, name='StockChart', update=True,
-                                   left=single_sheet.range('E7').left,
-                                   top=single_sheet.range('E7').top)
-        plt.close()
-    except Exception as e:
-        print(f"Error creating chart: {e}")
-        single_sheet.range('E7').value = f"Chart error: {e}"
+        # === SECTION 2: Key Metrics Table ===
+        cell = single_sheet.range(f'A{row}')
+        cell.value = "KEY METRICS"
+        single_sheet.range(f'A{row}:B{row}').color = (68, 114, 196)  # Blue header
+        apply_style(cell, STYLE_BANNER)  # White text
+        row += 2
 
-    # === Update News Sheet ===
-    try:
-        update_news_sheet(ticker, wb)
-    except Exception as e:
-        print(f"Error updating news: {e}")
+        start_metrics_row = row
+
+        start_metrics_row = row
+
+        # Build the whole table in memory and write it with a single range assignment
+        rows = []
+        header_rows = []  # sheet rows holding section headers
+        metric_rows = []  # (sheet row, position within its section)
+        for section_name, keys in _SECTIONS:
+            header_rows.append(row + len(rows))
+            rows.append([section_name, None])
+            for i, key in enumerate(keys):
+                metric_rows.append((row + len(rows), i))
+                rows.append([key, metrics.get(key, "N/A")])
+            rows.append([None, None])  # blank line after each section
+
+        single_sheet.range(f"A{row}").value = rows
+
+        # Section headers
+        for header_range in range_unions(single_sheet, [f"A{r}:B{r}" for r in header_rows]):
+            header_range.color = (31, 78, 120)  # Dark blue
+        for header_range in range_unions(single_sheet, [f"A{r}" for r in header_rows]):
+            apply_style(header_range, STYLE_HEADER)  # White
+
+        # Alternating row colors within each section
+        gray_addrs = [f"A{r}:B{r}" for r, i in metric_rows if i % 2 == 0]
+        white_addrs = [f"A{r}:B{r}" for r, i in metric_rows if i % 2 == 1]
+        for row_range in range_unions(single_sheet, gray_addrs):
+            row_range.color = (242, 242, 242)  # Light gray
+        for row_range in range_unions(single_sheet, white_addrs):
+            row_range.color = (255, 255, 255)  # White
+
+        row += len(rows)
+
+        # Right align numbers
+        single_sheet.range(f"B{start_metrics_row}:B{row-1}").api.HorizontalAlignment = -4152  # xlRight
+
+        # Add borders to entire table
+        table_range = single_sheet.range(f'A{start_metrics_row}:B{row-1}')
+        for border_id in [7, 8, 9, 10, 11, 12]:  # All border types
+            table_range.api.Borders(border_id).LineStyle = 1
+            table_range.api.Borders(border_id).Weight = 2
+            table_range.api.Borders(border_id).Color = 0x000000
+
+        set_last_row(wb, 'LastAnalysisRow', row - 1)
+
+        # Format columns
+        single_sheet.range('A:A').column_width = 24
+        single_sheet.range('B:B').column_width = 20
+        # === SECTION 3: Enhanced Stock Price Chart with Volume ===
+        try:
+            # Create figure with 2 subplots (price and volume)
+            # (plain Figure, no pyplot state to register or close)
+            fig = Figure(figsize=(10, 8))
+            ax1, ax2 = fig.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1]},
+                                    sharex=True)
+        
+            # Long histories are thinned to ~500 points; stats below use the full `hist`
+            plot_hist = _downsample(hist)
+            dates = plot_dates(plot_hist.index)
+
+            # ========== TOP CHART: PRICE + MOVING AVERAGES ==========
+            # Plot closing price
+            ax1.plot(dates, plot_hist['Close'], linewidth=2.5, color='#2E86DE', label=f'{ticker}', zorder=3)
+        
+            # Calculate and plot moving averages (skipped when history is too short)
+            ma_colors = {50: '#F39C12', 200: '#E74C3C'}
+            for window, ma in moving_averages(hist['Close'].to_numpy(), windows=(50, 200)).items():
+                ax1.plot(dates, _downsample(ma), linewidth=1.5, color=ma_colors[window], 
+                        label=f'{window}-day MA', linestyle='--', alpha=0.8, zorder=2)
+        
+            # Add 52-week high/low lines
+            if fifty_two_week_high:
+                ax1.axhline(y=fifty_two_week_high, color='#27AE60', linestyle=':', 
+                           linewidth=1.5, alpha=0.6, label='52W High', zorder=1)
+        
+            if fifty_two_week_low:
+                ax1.axhline(y=fifty_two_week_low, color='#C0392B', linestyle=':', 
+                           linewidth=1.5, alpha=0.6, label='52W Low', zorder=1)
+        
+            # Add current price annotation
+            current_price = hist['Close'].iloc[-1]
+            last_date = dates[-1]
+            ax1.annotate(f'${current_price:.2f}', 
+                        xy=(last_date, current_price),
+                        xytext=(10, 0), 
+                        textcoords='offset points',
+                        fontsize=10,
+                        fontweight='bold',
+                        color='#2E86DE',
+                        bbox=dict(boxstyle='round,pad=0.4', facecolor='white', 
+                                 edgecolor='#2E86DE', linewidth=2),
+                        zorder=5)
+        
+            # Add dot at current price
+            ax1.scatter([last_date], [current_price], color='#2E86DE', s=100, zorder=5)
+        
+            # Calculate price change
+            start_price = hist['Close'].iloc[0]
+            price_change = current_price - start_price
+            price_change_pct = (price_change / start_price) * 100
+            change_color = '#27AE60' if price_change >= 0 else '#E74C3C'
+            change_sign = '+' if price_change >= 0 else ''
+        
+            # Title with price change
+            title_text = f'{ticker} Stock Price - {period_option}\n{change_sign}${price_change:.2f} ({change_sign}{price_change_pct:.2f}%)'
+            ax1.set_title(title_text, fontsize=15, fontweight='bold', pad=15, color=change_color)
+        
+            ax1.set_ylabel('Price ($)', fontsize=11, fontweight='bold')
+            ax1.grid(True, alpha=0.2, linestyle='--')
+            ax1.set_facecolor('#F8F9FA')
+            ax1.legend(loc='upper left', fontsize=9, framealpha=0.9)
+        
+            # ========== BOTTOM CHART: VOLUME ==========
+            close = plot_hist['Close'].to_numpy()
+            open_ = plot_hist['Open'].to_numpy()
+            colors = np.where(close >= open_, '#27AE60', '#E74C3C').tolist()
+            bar_width = 0.8 * _downsample_step(len(hist))  # widen bars to cover skipped days
+        
+            ax2.bar(dates, plot_hist['Volume'], color=colors, alpha=0.6, width=bar_width)
+            ax2.set_ylabel('Volume', fontsize=11, fontweight='bold')
+            ax2.set_xlabel('Date', fontsize=11, fontweight='bold')
+            ax2.grid(True, alpha=0.2, linestyle='--', axis='y')
+            ax2.set_facecolor('#F8F9FA')
+        
+            # Format volume numbers (millions/billions)
+            ax2.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/1e6:.0f}M' if x >= 1e6 else f'{x:.0f}'))
+        
+            # Format x-axis dates as MM/YY
+            ax2.xaxis.set_major_formatter(mdates.DateFormatter('%m/%y'))
+            ax2.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+        
+            setp(ax2.get_xticklabels(), rotation=45, ha='right')
+        
+            fig.patch.set_facecolor('white')
+            fig.tight_layout()
+        
+            # Add chart to Excel
+            anchor = single_sheet.range('E7')
+            left, top = anchor.left, anchor.top
+            single_sheet.pictures.add(fig, name='StockChart', update=True,
+                                       left=left, top=top,
+                                       export_options=CHART_EXPORT_OPTIONS)
+        except Exception as e:
+            print(f"Error creating chart: {e}")
+            single_sheet.range('E7').value = f"Chart error: {e}"
+
+        # === Update News Sheet ===
+        try:
+            if news_data is not None:
+                update_news_sheet(ticker, wb, news_data=news_data)
+        except Exception as e:
+            print(f"Error updating news: {e}")
 
     # Success message
     try:
-        single_sheet.range('B5').value = f"Analysis complete for {ticker}!"
-        single_sheet.range('B5').font.color = (0, 128, 0)
+        status_cell = single_sheet.range('B5')
+        status_cell.value = f"Analysis complete for {ticker}!"
+        status_cell.font.color = (0, 128, 0)
     except Exception as e:
         single_sheet.range('B5').value = f"Error at end: {str(e)}"
         print(f"Final error: {e}")
@@ -665,261 +1024,267 @@ def compare_stocks():
         ticker2 = compare_sheet.range('B3').value
         ticker3 = compare_sheet.range('B4').value
         
-        period_map = {
-            '1 Week': '5d',
-            '1 Month': '1mo',
-            '3 Months': '3mo',
-            '6 Months': '6mo',
-            '1 Year': '1y',
-            '2 Years': '2y',
-            '5 Years': '5y',
-            'Max': 'max'
-        }
-        
         period_option = compare_sheet.range('B5').value or '1 Year'
-        period = period_map.get(str(period_option).strip(), '1y')
+        period = _PERIOD_MAP.get(str(period_option).strip(), '1y')
         
-        # Build tickers list from individual cells
+        # Build tickers list from individual cells (a repeated ticker counts once)
         tickers = []
         for t in [ticker1, ticker2, ticker3]:
             if t and str(t).strip():
-                tickers.append(str(t).strip().upper())
+                t = str(t).strip().upper()
+                if t not in tickers:
+                    tickers.append(t)
         
         if len(tickers) < 2:
-            compare_sheet.range('B7').value = "Please enter at least 2 tickers"
+            compare_sheet.range('B7').value = "Please enter at least 2 different tickers"
             return
         
-        # Clear previous
-        compare_sheet.range('A10:Z200').clear_contents()
-
         # Fetch all data
+        compare_sheet.range('B7').value = f"Loading {', '.join(tickers)}..."
+        bulk_data = get_stock_data_bulk(tickers, period)
+
+        def fetch_one(ticker):
+            """Statement + key metrics for one ticker (runs in a worker thread)"""
+            stock, hist, info = bulk_data[ticker]
+            if not stock or hist is None or hist.empty:
+                return ticker, None
+            statement_metrics = get_statement_metrics(stock)
+            metrics = calculate_key_metrics(info, hist, statement_metrics, stock.fast_info)
+            return ticker, {'stock': stock, 'hist': hist, 'info': info, 'metrics': metrics}
+
+        # Only data work runs in the pool; xlwings writes stay on this thread
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            futures = [ex.submit(fetch_one, t) for t in tickers]
+
         stock_data = {}
-        for i, ticker in enumerate(tickers):
-            compare_sheet.range('B7').value = f"Loading {ticker} ({i+1}/{len(tickers)})..."
-            
-            stock, hist, info = get_stock_data(ticker, period)
-            if stock and hist is not None and not hist.empty:
-                try:
-                    statement_metrics = get_statement_metrics(stock)
-                    metrics = calculate_key_metrics(info, hist, statement_metrics)
-                    stock_data[ticker] = {'stock': stock, 'hist': hist, 'info': info, 'metrics': metrics}
-                except Exception as e:
-                    compare_sheet.range('B7').value = f"Error processing {ticker}: {str(e)}"
-                    print(f"Error with {ticker}: {e}")
-                    return
-            else:
+        for ticker, future in zip(tickers, futures):
+            try:
+                _, data = future.result()
+            except Exception as e:
+                compare_sheet.range('B7').value = f"Error processing {ticker}: {str(e)}"
+                print(f"Error with {ticker}: {e}")
+                return
+            if data is None:
                 compare_sheet.range('B7').value = f"Error loading {ticker} - no data returned"
                 return
+            stock_data[ticker] = data
             
         # === Comparison Table ===
         compare_sheet.range('B7').value = f"Building comparison table..."
         
-        row = 10
-        compare_sheet.range(f'A{row}').value = "STOCK COMPARISON"
-        compare_sheet.range(f'A{row}').font.bold = True
-        compare_sheet.range(f'A{row}').font.size = 16
-        
-        # Color the main header
-        header_range = compare_sheet.range(f'A{row}:{chr(65 + len(tickers))}{row}')
-        header_range.color = (68, 114, 196)  # Blue
-        compare_sheet.range(f'A{row}').api.Font.Color = 0xFFFFFF
-        row += 2
-        
-        start_table_row = row
-        
-        # Build column headers
-        compare_sheet.range(f'A{row}').value = "Metric"
-        compare_sheet.range(f'A{row}').font.bold = True
-        compare_sheet.range(f'A{row}').color = (31, 78, 120)
-        compare_sheet.range(f'A{row}').api.Font.Color = 0xFFFFFF
-        
-        for i, ticker in enumerate(tickers):
-            cell = compare_sheet.range(row, i + 2)
-            cell.value = ticker
-            cell.font.bold = True
-            cell.color = (31, 78, 120)
-            cell.api.Font.Color = 0xFFFFFF
-            cell.api.HorizontalAlignment = -4108  # Center
-        row += 1
+        # Every sheet write from here on runs with repaint/recalc paused;
+        # the status messages above stay outside so they still show
+        with excel_paused(compare_sheet.book.app):
+            # Clear previous
+            last_row = max(get_last_row(compare_sheet.book, 'LastCompareRow', 200), 10)
+            compare_sheet.range(f'A10:Z{last_row}').clear_contents()
+
+            row = 10
+            title_cell = compare_sheet.range(f'A{row}')
+            title_cell.value = "STOCK COMPARISON"
         
-        # Company names
-        compare_sheet.range(f'A{row}').value = "Company Name"
-        compare_sheet.range(f'A{row}').font.italic = True
-        compare_sheet.range(f'A{row}').color = (217, 217, 217)
-        
-        for i, ticker in enumerate(tickers):
-            cell = compare_sheet.range(row, i + 2)
-            cell.value = stock_data[ticker]['info'].get('longName', ticker)
-            cell.font.size = 9
-            cell.color = (217, 217, 217)
-            cell.api.HorizontalAlignment = -4108
-        row += 1
+            # Color the main header
+            header_range = compare_sheet.range((row, 1), (row, 1 + len(tickers)))
+            header_range.color = (68, 114, 196)  # Blue
+            apply_style(title_cell, STYLE_BANNER)
+            row += 2
         
-        # Define sections
-        sections = {
-            "INCOME STATEMENT": [
-                "Revenue (TTM)", "Net Income (TTM)", "Operating Income (TTM)", "EBITDA (TTM)",
-            ],
-            "PROFITABILITY & MARGINS": [
-                "Profit Margin", "Operating Margin", "EBITDA Margin", "Return on Equity (ROE)",
-            ],
-            "GROWTH": [
-                "Revenue Growth (YoY)", "Earnings Growth (YoY)",
-            ],
-            "VALUATION": [
-                "Current Price", "Market Cap", "52-Week High", "52-Week Low", 
-                "Distance from 52W High", "P/E Ratio", "Forward P/E", "Price to Sales (P/S)",
-            ],
-            "DIVIDENDS": [
-                "Dividend Yield", "Payout Ratio",
-            ],
-            "RISK": [
-                "Beta",
-            ],
-        }
-        
-        # Build metrics table
-        metric_count = 0
-        for section_name, metric_keys in sections.items():
-            # Section Header
-            section_range = compare_sheet.range(f'A{row}:{chr(65 + len(tickers))}{row}')
-            section_range.value = [[section_name] + [""] * len(tickers)]
-            section_range.color = (31, 78, 120)
-            compare_sheet.range(f'A{row}').api.Font.Color = 0xFFFFFF
-            compare_sheet.range(f'A{row}').font.bold = True
-            row += 1
-            
-            # Metrics
-            for metric_name in metric_keys:
-                compare_sheet.range(f'A{row}').value = metric_name
-                
-                # Alternating colors
-                if metric_count % 2 == 0:
-                    row_range = compare_sheet.range(f'A{row}:{chr(65 + len(tickers))}{row}')
-                    row_range.color = (242, 242, 242)  # Light gray
-                else:
-                    row_range = compare_sheet.range(f'A{row}:{chr(65 + len(tickers))}{row}')
-                    row_range.color = (255, 255, 255)  # White
-                
-                # Fill values
-                for i, ticker in enumerate(tickers):
-                    cell = compare_sheet.range(row, i + 2)
-                    cell.value = stock_data[ticker]['metrics'].get(metric_name, 'N/A')
-                    cell.api.HorizontalAlignment = -4152  # Right align
-                
-                row += 1
-                metric_count += 1
-            
-            row += 1  # Blank line
+            start_table_row = row
         
-        # Format columns
-        compare_sheet.range('A:A').column_width = 24
-        for i in range(len(tickers)):
-            compare_sheet.range(f'{chr(66 + i)}:{chr(66 + i)}').column_width = 18
+            # Build the whole table (column headers, company names, metric sections)
+            # in memory and write it with a single range assignment
+            last_col = column_letter(1 + len(tickers))  # letters still needed for union addresses
+            rows = [
+                ["Metric"] + tickers,
+                ["Company Name"] + [stock_data[ticker]['info'].get('longName', ticker) for ticker in tickers],
+            ]
+            section_rows = []  # sheet rows holding section headers
+            metric_rows = []   # (sheet row, running metric index)
+            metric_count = 0
+            for section_name, metric_keys in _SECTIONS:
+                section_rows.append(start_table_row + len(rows))
+                rows.append([section_name] + [""] * len(tickers))
+
+                for metric_name in metric_keys:
+                    metric_rows.append((start_table_row + len(rows), metric_count))
+                    rows.append([metric_name] + [stock_data[ticker]['metrics'].get(metric_name, 'N/A')
+                                                 for ticker in tickers])
+                    metric_count += 1
+
+                rows.append([None] * (len(tickers) + 1))  # Blank line
+
+            compare_sheet.range(f'A{start_table_row}').value = rows
+            row = start_table_row + len(rows)
+
+            # Column headers (share fill + font style with the section headers below)
+            header_row = start_table_row
+            compare_sheet.range(f'B{header_row}:{last_col}{header_row}').api.HorizontalAlignment = -4108  # Center
+
+            # Company names
+            name_row = start_table_row + 1
+            compare_sheet.range(f'A{name_row}:{last_col}{name_row}').color = (217, 217, 217)
+            compare_sheet.range(f'A{name_row}').font.italic = True
+            company_names = compare_sheet.range(f'B{name_row}:{last_col}{name_row}')
+            company_names.font.size = 9
+            company_names.api.HorizontalAlignment = -4108
+
+            # Column + section headers
+            header_fill_addrs = [f'A{r}:{last_col}{r}' for r in [header_row] + section_rows]
+            header_font_addrs = [f'A{header_row}:{last_col}{header_row}'] + [f'A{r}' for r in section_rows]
+            for section_range in range_unions(compare_sheet, header_fill_addrs):
+                section_range.color = (31, 78, 120)
+            for section_range in range_unions(compare_sheet, header_font_addrs):
+                apply_style(section_range, STYLE_HEADER)
+
+            # Alternating colors
+            gray_addrs = [f'A{r}:{last_col}{r}' for r, n in metric_rows if n % 2 == 0]
+            white_addrs = [f'A{r}:{last_col}{r}' for r, n in metric_rows if n % 2 == 1]
+            for row_range in range_unions(compare_sheet, gray_addrs):
+                row_range.color = (242, 242, 242)  # Light gray
+            for row_range in range_unions(compare_sheet, white_addrs):
+                row_range.color = (255, 255, 255)  # White
+
+            # Right align values
+            compare_sheet.range(f'B{name_row + 1}:{last_col}{row - 1}').api.HorizontalAlignment = -4152
+            set_last_row(compare_sheet.book, 'LastCompareRow', row - 1)
         
-        compare_sheet.range('B7').value = f"Creating chart..."
-
-        # === Comparison Chart (line chart LEFT, summary table RIGHT) ===
-        try:
-            import matplotlib.dates as mdates
-
-            fig = plt.figure(figsize=(12, 7))
-            gs = fig.add_gridspec(1, 2, width_ratios=[3.2, 1.4])
-
-            ax = fig.add_subplot(gs[0, 0])       # chart axis (left)
-            ax_tbl = fig.add_subplot(gs[0, 1])   # table axis (right)
-            ax_tbl.axis('off')
+            # Format columns
+            compare_sheet.range('A:A').column_width = 24
+            compare_sheet.range((1, 2), (1, 1 + len(tickers))).column_width = 18  # all ticker columns at once
 
-            colors = ['#2E86DE', '#E67E22', '#27AE60', '#9B59B6', '#E74C3C']
-            summary_data = []
-
-            for i, ticker in enumerate(tickers):
-                hist = stock_data[ticker]['hist']
+            # === Comparison Chart (line chart LEFT, summary table RIGHT) ===
+            try:
+                # Stack all closes once; stats + normalization run column-wise
+                # (sorted explicitly: first/last-valid lookups and LTTB need ascending dates)
+                closes = pd.concat({t: stock_data[t]['hist']['Close'] for t in tickers}, axis=1).sort_index()
+                start = closes.bfill().iloc[0]   # first valid close per ticker
+                end = closes.ffill().iloc[-1]    # last valid close per ticker
+                chg = end - start
+                pct = chg / start * 100
+
+                # % change from each column's first valid close, in place on one buffer
+                norm = closes.to_numpy(dtype=np.float64, copy=True)
+                first_valid = np.isfinite(norm).argmax(axis=0)
+                norm /= norm[first_valid, np.arange(norm.shape[1])]
+                norm -= 1
+                norm *= 100
+
+                # Nothing to draw: skip the figure and table rendering entirely
+                if not np.isfinite(norm).any():
+                    try:
+                        compare_sheet.pictures['ComparisonChart'].delete()  # stale chart from the last run
+                    except Exception:
+                        pass
+                    compare_sheet.range('B7').value = "No data"
+                    return
 
-                normalized = (hist['Close'] / hist['Close'].iloc[0] - 1) * 100
-                ax.plot(
-                    normalized.index, normalized,
-                    label=ticker,
-                    linewidth=2.5,
-                    color=colors[i % len(colors)]
+                # Render at the size the chart occupies on the sheet, not larger: the
+                # existing picture's box (kept where the user put it), else F10:S30
+                try:
+                    old_chart = compare_sheet.pictures['ComparisonChart']
+                    left, top = old_chart.left, old_chart.top
+                    width, height = old_chart.width, old_chart.height
+                except Exception:
+                    old_chart = None
+                    area = compare_sheet.range('F10:S30')
+                    left, top = area.left, area.top
+                    width, height = area.width, area.height
+                fig, ax, ax_tbl = _get_compare_fig(figsize_for_points(width, height))
+
+                colors = ['#2E86DE', '#E67E22', '#27AE60', '#9B59B6', '#E74C3C']
+                ticker_colors = (colors * (len(tickers) // len(colors) + 1))[:len(tickers)]
+
+                # Thin long series to ~1200 points; the summary uses the full data
+                dates = plot_dates(closes.index)
+                x = dates.astype('datetime64[ns]').astype(np.int64)
+                date_nums = mdates.date2num(dates)
+
+                # All tickers go into one LineCollection: a single artist and Agg pass
+                segments = []
+                for i in range(len(tickers)):
+                    values = norm[:, i]
+                    valid = np.isfinite(values)
+                    idx = downsample_indices(x[valid], values[valid], n_out=1200)
+                    segments.append(np.column_stack((date_nums[valid][idx], values[valid][idx])))
+
+                ax.add_collection(LineCollection(segments, colors=ticker_colors, linewidths=2.5))
+                ax.autoscale_view()
+
+                ax.set_title('Stock Comparison (% Change from Start)', fontsize=15, fontweight='bold', pad=12)
+                ax.set_xlabel('Date', fontsize=11, fontweight='bold')
+                ax.set_ylabel('% Change', fontsize=11, fontweight='bold')
+                ax.grid(True, alpha=0.2, linestyle='--')
+                ax.axhline(y=0, color='black', linewidth=1, alpha=0.4)
+
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%y'))
+                ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+                setp(ax.get_xticklabels(), rotation=45, ha='right')
+
+                legend_handles = [Line2D([], [], color=c, linewidth=2.5, label=t)
+                                  for t, c in zip(tickers, ticker_colors)]
+                ax.legend(handles=legend_handles, loc='upper left', fontsize=10, framealpha=0.95)
+
+                # ----- build summary table on the RIGHT axis -----
+                chg_values = chg.loc[tickers].to_numpy()
+                pct_values = pct.loc[tickers].to_numpy()
+                signs = np.where(chg_values >= 0, "+", "")
+                table_rows = [list(cells) for cells in zip(
+                    tickers,
+                    start.loc[tickers].map('${:.2f}'.format),
+                    end.loc[tickers].map('${:.2f}'.format),
+                    [f"{sign}${v:.2f}" for sign, v in zip(signs, chg_values)],
+                    [f"{sign}{v:.2f}%" for sign, v in zip(signs, pct_values)],
+                )]
+
+                tbl = ax_tbl.table(
+                    cellText=table_rows,
+                    colLabels=['Ticker', 'Start', 'End', '$ Chg', '% Chg'],
+                    cellLoc='center',
+                    colLoc='center',
+                    loc='center'
                 )
 
-                start_price = float(hist['Close'].iloc[0])
-                end_price = float(hist['Close'].iloc[-1])
-                price_change = end_price - start_price
-                pct_change = (price_change / start_price) * 100
-
-                summary_data.append((ticker, start_price, end_price, price_change, pct_change, colors[i % len(colors)]))
-
-            ax.set_title('Stock Comparison (% Change from Start)', fontsize=15, fontweight='bold', pad=12)
-            ax.set_xlabel('Date', fontsize=11, fontweight='bold')
-            ax.set_ylabel('% Change', fontsize=11, fontweight='bold')
-            ax.grid(True, alpha=0.2, linestyle='--')
-            ax.axhline(y=0, color='black', linewidth=1, alpha=0.4)
-
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%y'))
-            ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
-            plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-
-            ax.legend(loc='upper left', fontsize=10, framealpha=0.95)
-
-            # ----- build summary table on the RIGHT axis -----
-            table_rows = []
-            for tkr, start, end, chg, pct, c in summary_data:
-                sign = "+" if chg >= 0 else ""
-                table_rows.append([
-                    tkr,
-                    f"${start:.2f}",
-                    f"${end:.2f}",
-                    f"{sign}${chg:.2f}",
-                    f"{sign}{pct:.2f}%"
-                ])
-
-            tbl = ax_tbl.table(
-                cellText=table_rows,
-                colLabels=['Ticker', 'Start', 'End', '$ Chg', '% Chg'],
-                cellLoc='center',
-                colLoc='center',
-                loc='center'
-            )
-
-            tbl.auto_set_font_size(False)
-            tbl.set_fontsize(9)
-            tbl.scale(1.05, 1.4)
-
-            # style header row
-            for j in range(5):
-                cell = tbl[(0, j)]
-                cell.set_facecolor('#31508C')
-                cell.set_text_props(weight='bold', color='white')
-
-            # style body rows
-            for i, (tkr, start, end, chg, pct, c) in enumerate(summary_data):
-                row_color = '#F2F2F2' if i % 2 == 0 else 'white'
-                for j in range(5):
-                    cell = tbl[(i + 1, j)]
-                    cell.set_facecolor(row_color)
-
-                    if j == 0:  # ticker column
-                        cell.set_text_props(weight='bold', color=c)
-
-                    if j == 4:  # % change column
-                        cell.set_text_props(weight='bold', color=('#27AE60' if pct >= 0 else '#E74C3C'))
-
-            plt.tight_layout()
+                tbl.auto_set_font_size(False)
+                tbl.set_fontsize(9)
+                tbl.scale(1.05, 1.4)
 
-            compare_sheet.pictures.add(
-                fig,
-                name='ComparisonChart',
-                update=True,
-                left=compare_sheet.range('F10').left,
-                top=compare_sheet.range('F10').top
-            )
-            plt.close(fig)
+                # style header row
+                for j in range(5):
+                    cell = tbl[(0, j)]
+                    cell.set_facecolor('#31508C')
+                    cell.set_text_props(weight='bold', color='white')
+
+                # style body rows: fills first, then the ticker / % change columns
+                n_rows = len(tickers)
+                row_colors = ['#F2F2F2' if i % 2 == 0 else 'white' for i in range(n_rows)]
+                pct_colors = np.where(pct_values >= 0, '#27AE60', '#E74C3C')
+                for i, row_color in enumerate(row_colors):
+                    for j in range(5):
+                        tbl[(i + 1, j)].set_facecolor(row_color)
+
+                for i, color in enumerate(ticker_colors):
+                    tbl[(i + 1, 0)].set_text_props(weight='bold', color=color)
+
+                for i, color in enumerate(pct_colors):
+                    tbl[(i + 1, 4)].set_text_props(weight='bold', color=color)
+
+                fig.tight_layout()
+
+                # Re-add rather than update=True: update keeps the old picture's
+                # width/height and would stretch the new PNG into it
+                if old_chart is not None:
+                    old_chart.delete()
+                compare_sheet.pictures.add(
+                    fig,
+                    name='ComparisonChart',
+                    left=left,
+                    top=top,
+                    export_options=CHART_EXPORT_OPTIONS
+                )
 
-        except Exception as e:
-            print(f"Error creating comparison chart: {e}")
-            compare_sheet.range('B7').value = f"Chart error: {e}"
+            except Exception as e:
+                print(f"Error creating comparison chart: {e}")
+                compare_sheet.range('B7').value = f"Chart error: {e}"
         
         compare_sheet.range('B7').value = "✓ Comparison complete!"
         